@@ -1,10 +1,1244 @@
 import flet as ft
 import yt_dlp
+import csv
 import json
 import os
+import mmap
+import time
+import struct
+import socket
+import sqlite3
+import argparse
+import subprocess
+import multiprocessing
+from array import array
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 import threading
+from yt_dlp.postprocessor import FFmpegPostProcessor
+
+# NumPy es opcional: solo lo usa el análisis de audio
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Carpeta de descargas por defecto (app y workers)
+DEFAULT_DOWNLOAD_PATH = str(Path.home() / "Downloads" / "PyTube")
+
+
+# ===== MOTOR DE DESCARGA =====
+def safe_filename(title):
+    """Limpia un título para usarlo como nombre de archivo"""
+    return "".join(c for c in title if c.isalnum() or c in (' ', '-', '_')).strip()
+
+
+def build_download_options(folder, safe_title, format_type, quality,
+                           audio_format="mp3", progress_hooks=None, format_id=None):
+    """Construye las opciones de yt-dlp para una descarga"""
+    ydl_opts = {
+        'outtmpl': os.path.join(folder, f'{safe_title}.%(ext)s'),
+        'progress_hooks': list(progress_hooks or []),
+    }
+    
+    # Configurar según tipo de descarga
+    if format_type == "audio":
+        ydl_opts['format'] = 'bestaudio/best'
+        ydl_opts['postprocessors'] = [{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': audio_format,
+            'preferredquality': '192',
+        }]
+    else:
+        if quality == "best":
+            ydl_opts['format'] = 'bestvideo+bestaudio/best'
+        else:
+            ydl_opts['format'] = f'bestvideo[height<={quality[:-1]}]+bestaudio/best[height<={quality[:-1]}]'
+    
+    # Formatos elegidos localmente; el preset queda como respaldo
+    if format_id:
+        ydl_opts['format'] = f"{format_id}/{ydl_opts['format']}"
+    
+    return ydl_opts
+
+
+def run_download(url, ydl_opts, postprocessors=()):
+    """Descarga una URL con las opciones indicadas y etapas de postproceso extra"""
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        for pp in postprocessors:
+            ydl.add_post_processor(pp, when='post_process')
+        ydl.download([url])
+
+
+# ===== SELECCIÓN DE FORMATOS =====
+# Códecs que se copian sin recodificar al contenedor de destino
+COMPATIBLE_VIDEO_CODECS = ('avc1', 'h264')
+COMPATIBLE_AUDIO_CODECS = {
+    "video": ('mp4a',),
+    "m4a": ('mp4a',),
+    "opus": ('opus',),
+    "mp3": ('mp3',),
+}
+
+
+def format_bytes(num_bytes):
+    """Convierte bytes a texto legible"""
+    if num_bytes is None:
+        return "--"
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if num_bytes < 1024 or unit == "GiB":
+            return f"{num_bytes:.1f} {unit}" if unit != "B" else f"{int(num_bytes)} B"
+        num_bytes /= 1024
+
+
+def format_time(seconds):
+    """Convierte segundos a m:ss o h:mm:ss"""
+    if seconds is None:
+        return "--"
+    mins, secs = divmod(int(seconds), 60)
+    hours, mins = divmod(mins, 60)
+    if hours:
+        return f"{hours}:{mins:02d}:{secs:02d}"
+    return f"{mins}:{secs:02d}"
+
+
+def format_size(fmt, duration=None):
+    """Tamaño del formato en bytes: exacto, aproximado o estimado por bitrate"""
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if not size and fmt.get('tbr') and duration:
+        size = fmt['tbr'] * 1000 / 8 * duration
+    return size
+
+
+def _is_compatible_codec(codec, compatible_codecs):
+    """Indica si un códec (p. ej. 'avc1.640028') está en la lista de compatibles"""
+    return bool(codec) and codec.split('.')[0].lower() in compatible_codecs
+
+
+def select_formats(info, format_type, quality, audio_format="mp3", avoid_conversion=True):
+    """Elige localmente los formatos a descargar a partir del info dict de yt-dlp.
+    
+    Devuelve un diccionario con 'format_id', 'description' y 'size' (bytes o
+    None), o None si el info dict no trae formatos utilizables.
+    """
+    duration = info.get('duration')
+    videos, audios, combined = [], [], []
+    # yt-dlp ordena los formatos de peor a mejor: la posición desempata
+    positions = {}
+    for position, fmt in enumerate(info.get('formats') or []):
+        if fmt.get('ext') == 'mhtml' or not fmt.get('format_id'):
+            continue
+        positions[id(fmt)] = position
+        has_video = fmt.get('vcodec') not in (None, 'none')
+        has_audio = fmt.get('acodec') not in (None, 'none')
+        if has_video and has_audio:
+            combined.append(fmt)
+        elif has_video:
+            videos.append(fmt)
+        elif has_audio:
+            audios.append(fmt)
+    
+    audio_codecs = COMPATIBLE_AUDIO_CODECS.get(
+        "video" if format_type != "audio" else audio_format, ()
+    )
+    
+    def preferences(fmt):
+        # Las mismas preferencias que yt-dlp pone antes de la calidad
+        # (pista original frente a doblajes, DRC, etc.)
+        return (fmt.get('language_preference') or 0, fmt.get('preference') or 0)
+    
+    def audio_key(fmt, codecs=audio_codecs):
+        compatible = avoid_conversion and _is_compatible_codec(fmt.get('acodec'), codecs)
+        return (*preferences(fmt), compatible, fmt.get('abr') or fmt.get('tbr') or 0,
+                positions[id(fmt)])
+    
+    def video_key(fmt):
+        compatible = avoid_conversion and _is_compatible_codec(fmt.get('vcodec'), COMPATIBLE_VIDEO_CODECS)
+        return (fmt.get('height') or 0, fmt.get('preference') or 0, compatible,
+                fmt.get('fps') or 0, fmt.get('tbr') or 0, positions[id(fmt)])
+    
+    def describe(fmt):
+        parts = [fmt.get('format_id')]
+        if fmt.get('height'):
+            parts.append(f"{fmt['height']}p")
+        for codec in (fmt.get('vcodec'), fmt.get('acodec')):
+            if codec not in (None, 'none'):
+                parts.append(codec.split('.')[0])
+        return " ".join(parts)
+    
+    if format_type == "audio":
+        candidates = audios or combined
+        if not candidates:
+            return None
+        best = max(candidates, key=audio_key)
+        return {
+            'format_id': best['format_id'],
+            'description': describe(best),
+            'size': format_size(best, duration),
+        }
+    
+    limit = None if quality == "best" else int(quality[:-1])
+    
+    def within_limit(fmt):
+        return limit is None or (fmt.get('height') or 0) <= limit
+    
+    videos = [f for f in videos if within_limit(f)]
+    combined = [f for f in combined if within_limit(f)]
+    
+    best_video = max(videos, key=video_key) if videos else None
+    best_combined = max(combined, key=video_key) if combined else None
+    
+    # Un formato combinado de igual altura evita la fusión con ffmpeg
+    if best_combined and (not best_video or not audios or
+                          (best_combined.get('height') or 0) >= (best_video.get('height') or 0)):
+        return {
+            'format_id': best_combined['format_id'],
+            'description': describe(best_combined),
+            'size': format_size(best_combined, duration),
+        }
+    if not best_video or not audios:
+        return None
+    
+    # El audio acompaña al contenedor del video (mp4a con avc1, opus con vp9/av01)
+    if _is_compatible_codec(best_video.get('vcodec'), COMPATIBLE_VIDEO_CODECS):
+        best_audio = max(audios, key=audio_key)
+    else:
+        best_audio = max(audios, key=lambda f: audio_key(f, ('opus', 'vorbis')))
+    
+    video_size = format_size(best_video, duration)
+    audio_size = format_size(best_audio, duration)
+    return {
+        'format_id': f"{best_video['format_id']}+{best_audio['format_id']}",
+        'description': f"{describe(best_video)} + {describe(best_audio)}",
+        'size': video_size + audio_size if video_size and audio_size else None,
+    }
+
+
+# ===== COLA DE TRABAJOS COMPARTIDA =====
+class JobQueue:
+    """Cola de descargas en un archivo SQLite, pensada para almacenamiento compartido.
+    
+    Los workers toman trabajos con un lease que renuevan con latidos; si un
+    worker muere, su lease expira y otro worker puede reclamar el trabajo.
+    """
+    
+    def __init__(self, path, lease_seconds=60, max_attempts=3):
+        self.path = str(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    options TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    worker TEXT,
+                    lease_until REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    progress REAL NOT NULL DEFAULT 0,
+                    speed REAL,
+                    eta INTEGER,
+                    downloaded INTEGER,
+                    total INTEGER,
+                    path TEXT,
+                    error TEXT,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id)"
+            )
+    
+    @contextmanager
+    def _connect(self):
+        """Abre una conexión en modo autocommit y la cierra al terminar"""
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def _row_to_dict(row):
+        """Convierte una fila en diccionario con las opciones decodificadas"""
+        job = dict(row)
+        job['options'] = json.loads(job['options'])
+        return job
+    
+    def enqueue(self, url, title, options):
+        """Añade un trabajo pendiente y devuelve su id"""
+        now = time.time()
+        with self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO jobs (url, title, options, created, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (url, title, json.dumps(options), now, now)
+            )
+            return cur.lastrowid
+    
+    def claim(self, worker_id):
+        """Toma el siguiente trabajo disponible (o con lease expirado) para un worker"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    now = time.time()
+                    row = conn.execute(
+                        "SELECT * FROM jobs WHERE status = 'pending' "
+                        "OR (status = 'running' AND lease_until < ?) "
+                        "ORDER BY id LIMIT 1",
+                        (now,)
+                    ).fetchone()
+                    if row is None:
+                        conn.execute("COMMIT")
+                        return None
+                    
+                    # Trabajos reclamados demasiadas veces se dan por fallidos
+                    if row['attempts'] >= self.max_attempts:
+                        conn.execute(
+                            "UPDATE jobs SET status = 'error', lease_until = NULL, "
+                            "error = COALESCE(error, 'Lease expirado demasiadas veces'), "
+                            "updated = ? WHERE id = ?",
+                            (now, row['id'])
+                        )
+                        continue
+                    
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, "
+                        "attempts = attempts + 1, progress = 0, speed = NULL, eta = NULL, "
+                        "updated = ? WHERE id = ?",
+                        (worker_id, now + self.lease_seconds, now, row['id'])
+                    )
+                    row = conn.execute(
+                        "SELECT * FROM jobs WHERE id = ?", (row['id'],)
+                    ).fetchone()
+                    conn.execute("COMMIT")
+                    return self._row_to_dict(row)
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+    
+    def heartbeat(self, job_id, worker_id, progress=None, speed=None, eta=None,
+                  downloaded=None, total=None):
+        """Renueva el lease y reporta el progreso; devuelve False si se perdió el trabajo"""
+        now = time.time()
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET lease_until = ?, updated = ?, "
+                "progress = COALESCE(?, progress), speed = ?, eta = ?, "
+                "downloaded = COALESCE(?, downloaded), total = COALESCE(?, total) "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (now + self.lease_seconds, now, progress, speed, eta,
+                 downloaded, total, job_id, worker_id)
+            )
+            return cur.rowcount == 1
+    
+    def complete(self, job_id, worker_id, path):
+        """Marca un trabajo como completado"""
+        now = time.time()
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'completed', progress = 1, path = ?, "
+                "lease_until = NULL, speed = NULL, eta = NULL, error = NULL, "
+                "updated = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (path, now, job_id, worker_id)
+            )
+            return cur.rowcount == 1
+    
+    def fail(self, job_id, worker_id, error):
+        """Registra un fallo; el trabajo vuelve a la cola si le quedan intentos"""
+        now = time.time()
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET "
+                "status = CASE WHEN attempts < ? THEN 'pending' ELSE 'error' END, "
+                "worker = CASE WHEN attempts < ? THEN NULL ELSE worker END, "
+                "lease_until = NULL, speed = NULL, eta = NULL, error = ?, "
+                "updated = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (self.max_attempts, self.max_attempts, str(error), now,
+                 job_id, worker_id)
+            )
+            return cur.rowcount == 1
+    
+    def list_jobs(self, limit=100):
+        """Devuelve los trabajos en curso y, después, los más recientes"""
+        with self._connect() as conn:
+            # Los trabajos en curso son los más antiguos pendientes de terminar:
+            # van primero para que no queden fuera del límite con una cola larga
+            rows = conn.execute(
+                "SELECT * FROM jobs ORDER BY status = 'running' DESC, id DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+    
+    def running(self):
+        """Devuelve todos los trabajos en curso con lease vigente"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'running' AND lease_until >= ? ORDER BY id",
+                (time.time(),)
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+    
+    def summary(self):
+        """Cuenta trabajos por estado, workers con lease vigente y completados en la última hora"""
+        now = time.time()
+        with self._connect() as conn:
+            counts = dict(conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall())
+            workers = conn.execute(
+                "SELECT COUNT(DISTINCT worker) FROM jobs "
+                "WHERE status = 'running' AND lease_until >= ?",
+                (now,)
+            ).fetchone()[0]
+            completed_last_hour = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'completed' AND updated >= ?",
+                (now - 3600,)
+            ).fetchone()[0]
+        return {'statuses': counts, 'active_workers': workers,
+                'completed_last_hour': completed_last_hour}
+
+
+# Textos de la interfaz para cada estado de la cola
+STATUS_LABELS = {
+    'pending': "pendiente",
+    'running': "en curso",
+    'completed': "completado",
+    'error': "error",
+}
+
+
+# ===== WORKER SIN INTERFAZ =====
+class DownloadWorker:
+    """Procesa trabajos de la cola compartida con el motor de descarga"""
+    
+    def __init__(self, job_queue, folder, worker_id=None, heartbeat_interval=5, idle_wait=5):
+        self.job_queue = job_queue
+        self.folder = folder
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_wait = idle_wait
+        os.makedirs(self.folder, exist_ok=True)
+    
+    def log(self, message):
+        """Escribe un mensaje con marca de tiempo"""
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] [{self.worker_id}] {message}", flush=True)
+    
+    def run(self, max_jobs=None, exit_when_empty=False):
+        """Bucle principal: toma trabajos hasta que se detenga el proceso"""
+        self.log(f"Worker iniciado (cola: {self.job_queue.path})")
+        processed = 0
+        while max_jobs is None or processed < max_jobs:
+            job = self.job_queue.claim(self.worker_id)
+            if job is None:
+                if exit_when_empty:
+                    break
+                time.sleep(self.idle_wait)
+                continue
+            self.process_job(job)
+            processed += 1
+        self.log(f"Worker detenido ({processed} trabajos)")
+    
+    def process_job(self, job):
+        """Descarga un trabajo renovando su lease mientras dura"""
+        options = job['options']
+        safe_title = safe_filename(job['title'])
+        state = {'progress': None, 'speed': None, 'eta': None,
+                 'downloaded': None, 'total': None}
+        finished = threading.Event()
+        lost = threading.Event()
+        
+        self.log(f"Trabajo #{job['id']}: {job['title']}")
+        
+        def hook(d):
+            # Solo se guarda el último estado; el hilo de latidos lo reporta
+            if lost.is_set():
+                raise yt_dlp.utils.DownloadCancelled("Lease perdido")
+            if d['status'] == 'downloading':
+                total = d.get('total_bytes') or d.get('total_bytes_estimate')
+                downloaded = d.get('downloaded_bytes')
+                state['downloaded'] = downloaded
+                state['total'] = total
+                state['speed'] = d.get('speed')
+                state['eta'] = d.get('eta')
+                if total and downloaded is not None:
+                    state['progress'] = min(downloaded / total, 1.0)
+        
+        def send_heartbeats():
+            last_ok = time.time()
+            while not finished.wait(self.heartbeat_interval):
+                try:
+                    valid = self.job_queue.heartbeat(job['id'], self.worker_id, **dict(state))
+                except Exception as e:
+                    # Errores transitorios (p. ej. "database is locked"): reintentar
+                    # mientras el lease pueda seguir vigente
+                    self.log(f"Trabajo #{job['id']}: error en latido: {e}")
+                    if time.time() - last_ok < self.job_queue.lease_seconds:
+                        continue
+                    valid = False
+                if not valid:
+                    self.log(f"Trabajo #{job['id']}: lease perdido")
+                    lost.set()
+                    return
+                last_ok = time.time()
+        
+        heartbeat_thread = threading.Thread(target=send_heartbeats, daemon=True)
+        heartbeat_thread.start()
+        try:
+            ydl_opts = build_download_options(
+                self.folder, safe_title,
+                options.get('format_type', 'video'),
+                options.get('quality', 'best'),
+                options.get('audio_format', 'mp3'),
+                progress_hooks=[hook],
+                format_id=options.get('format_id'),
+            )
+            ydl_opts['quiet'] = True
+            ydl_opts['no_warnings'] = True
+            run_download(job['url'], ydl_opts)
+        except Exception as e:
+            finished.set()
+            heartbeat_thread.join()
+            if not lost.is_set():
+                self.job_queue.fail(job['id'], self.worker_id, e)
+            self.log(f"Trabajo #{job['id']}: error: {e}")
+            return False
+        
+        finished.set()
+        heartbeat_thread.join()
+        if self.job_queue.complete(job['id'], self.worker_id,
+                                   os.path.join(self.folder, safe_title)):
+            self.log(f"Trabajo #{job['id']}: completado")
+            return True
+        self.log(f"Trabajo #{job['id']}: completado, pero el lease ya no era nuestro")
+        return False
+
+
+def run_worker(queue_path, folder, worker_id=None, exit_when_empty=False):
+    """Punto de entrada de un proceso worker"""
+    job_queue = JobQueue(queue_path)
+    worker = DownloadWorker(job_queue, folder, worker_id)
+    try:
+        worker.run(exit_when_empty=exit_when_empty)
+    except KeyboardInterrupt:
+        worker.log("Interrumpido")
+
+# ===== ANÁLISIS DE ARCHIVOS MULTIMEDIA =====
+MEDIA_EXTENSIONS = ('.mp4', '.m4a', '.mov', '.webm', '.mkv', '.opus', '.ogg', '.mp3')
+
+# Tablas de cabeceras MP3 (capa III)
+_MP3_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = (44100, 48000, 32000)
+
+
+def _mp4_boxes(mm, start, end):
+    """Recorre las cajas MP4 entre dos posiciones: (tipo, inicio_datos, fin)"""
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from('>I4s', mm, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', mm, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield kind, pos + header, min(pos + size, end)
+        pos += size
+
+
+def _find_box(mm, start, end, wanted_type):
+    """Devuelve (inicio, fin) de la primera caja de un tipo, o None"""
+    for kind, body_start, body_end in _mp4_boxes(mm, start, end):
+        if kind == wanted_type:
+            return body_start, body_end
+    return None
+
+
+def _probe_mp4(mm):
+    """Lee duración y códecs de la caja moov de un MP4/M4A"""
+    info = {'container': 'mp4', 'duration': None, 'video': None, 'audio': None}
+    moov = _find_box(mm, 0, len(mm), b'moov')
+    if moov is None:
+        return info
+    
+    for kind, body_start, end in _mp4_boxes(mm, *moov):
+        if kind == b'mvhd':
+            version = mm[body_start]
+            if version == 1:
+                timescale, duration = struct.unpack_from('>IQ', mm, body_start + 20)
+            else:
+                timescale, duration = struct.unpack_from('>II', mm, body_start + 12)
+            if timescale:
+                info['_timescale'] = timescale
+                if duration not in (0, 0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF):
+                    info['duration'] = duration / timescale
+        elif kind == b'mvex' and info['duration'] is None:
+            # MP4 fragmentado: la duración está en mehd
+            mehd = _find_box(mm, body_start, end, b'mehd')
+            if mehd and info.get('_timescale'):
+                struct_format = '>Q' if mm[mehd[0]] == 1 else '>I'
+                duration = struct.unpack_from(struct_format, mm, mehd[0] + 4)[0]
+                info['duration'] = duration / info['_timescale']
+        elif kind == b'trak':
+            mdia = _find_box(mm, body_start, end, b'mdia')
+            if mdia is None:
+                continue
+            hdlr = _find_box(mm, *mdia, b'hdlr')
+            stsd = None
+            minf = _find_box(mm, *mdia, b'minf')
+            if minf:
+                stbl = _find_box(mm, *minf, b'stbl')
+                if stbl:
+                    stsd = _find_box(mm, *stbl, b'stsd')
+            if hdlr is None or stsd is None or stsd[0] + 16 > stsd[1]:
+                continue
+            
+            handler = bytes(mm[hdlr[0] + 8:hdlr[0] + 12])
+            codec = bytes(mm[stsd[0] + 12:stsd[0] + 16]).decode('latin-1').strip()
+            if handler == b'vide' and info['video'] is None:
+                info['video'] = codec
+            elif handler == b'soun' and info['audio'] is None:
+                info['audio'] = codec
+    
+    info.pop('_timescale', None)
+    return info
+
+
+def _read_vint(mm, pos, is_id=False):
+    """Lee un entero de longitud variable EBML; devuelve (valor, nueva_pos)"""
+    first = mm[pos]
+    length, mask = 1, 0x80
+    while length <= 8 and not first & mask:
+        length += 1
+        mask >>= 1
+    if length > 8:
+        raise ValueError("vint EBML inválido")
+    
+    if is_id:
+        return int.from_bytes(mm[pos:pos + length], 'big'), pos + length
+    
+    value = first & (mask - 1)
+    for byte in mm[pos + 1:pos + length]:
+        value = (value << 8) | byte
+    if value == (1 << (7 * length)) - 1:
+        value = None  # Tamaño desconocido
+    return value, pos + length
+
+
+def _ebml_elements(mm, start, end):
+    """Recorre elementos EBML: (id, inicio_datos, fin)"""
+    pos = start
+    while pos < end:
+        element_id, pos = _read_vint(mm, pos, is_id=True)
+        size, pos = _read_vint(mm, pos)
+        element_end = end if size is None else min(pos + size, end)
+        yield element_id, pos, element_end, size is None
+        pos = element_end
+
+
+def _probe_matroska(mm):
+    """Lee duración y códecs de las secciones Info y Tracks de un WebM/MKV"""
+    info = {'container': 'webm', 'duration': None, 'video': None, 'audio': None}
+    for element_id, body_start, end, _ in _ebml_elements(mm, 0, len(mm)):
+        if element_id == 0x1A45DFA3:
+            # Cabecera EBML: DocType (webm/matroska)
+            for child_id, child_start, child_end, _ in _ebml_elements(mm, body_start, end):
+                if child_id == 0x4282:
+                    info['container'] = bytes(mm[child_start:child_end]).decode('ascii', 'ignore')
+        elif element_id == 0x18538067:
+            timescale, duration, has_tracks = 1000000, None, False
+            for child_id, child_start, child_end, unknown_size in _ebml_elements(mm, body_start, end):
+                if child_id == 0x1549A966:
+                    for field, field_start, field_end, _ in _ebml_elements(mm, child_start, child_end):
+                        if field == 0x2AD7B1:
+                            timescale = int.from_bytes(mm[field_start:field_end], 'big')
+                        elif field == 0x4489:
+                            struct_format = '>f' if field_end - field_start == 4 else '>d'
+                            duration = struct.unpack_from(struct_format, mm, field_start)[0]
+                elif child_id == 0x1654AE6B:
+                    has_tracks = True
+                    for track, track_start, track_end, _ in _ebml_elements(mm, child_start, child_end):
+                        if track != 0xAE:
+                            continue
+                        kind, codec = None, None
+                        for field, field_start, field_end, _ in _ebml_elements(mm, track_start, track_end):
+                            if field == 0x83:
+                                kind = int.from_bytes(mm[field_start:field_end], 'big')
+                            elif field == 0x86:
+                                codec = bytes(mm[field_start:field_end]).decode('ascii', 'ignore')
+                        if codec:
+                            codec = codec.split('_', 1)[-1].lower()
+                        if kind == 1 and info['video'] is None:
+                            info['video'] = codec
+                        elif kind == 2 and info['audio'] is None:
+                            info['audio'] = codec
+                elif child_id == 0x1F43B675 or unknown_size:
+                    break  # Clusters: ya no hay cabeceras que leer
+                if duration is not None and has_tracks:
+                    break
+            if duration is not None:
+                info['duration'] = duration * timescale / 1e9
+            break
+    return info
+
+
+def _probe_ogg(mm):
+    """Calcula la duración de un Ogg Opus/Vorbis con la granule de la última página"""
+    info = {'container': 'ogg', 'duration': None, 'video': None, 'audio': None}
+    segments = mm[26]
+    data = 27 + segments
+    sample_rate, pre_skip = None, 0
+    if mm[data:data + 8] == b'OpusHead':
+        info['audio'] = 'opus'
+        sample_rate = 48000  # Opus siempre cuenta muestras a 48 kHz
+        pre_skip = struct.unpack_from('<H', mm, data + 10)[0]
+    elif mm[data:data + 7] == b'\x01vorbis':
+        info['audio'] = 'vorbis'
+        sample_rate = struct.unpack_from('<I', mm, data + 12)[0]
+    if not sample_rate:
+        return info
+    
+    end = len(mm)
+    while True:
+        pos = mm.rfind(b'OggS', 0, end)
+        if pos < 0:
+            return info
+        granule = struct.unpack_from('<q', mm, pos + 6)[0]
+        if granule >= 0:
+            info['duration'] = max(granule - pre_skip, 0) / sample_rate
+            return info
+        end = pos
+
+
+def _probe_mp3(mm):
+    """Calcula la duración de un MP3 con la cabecera Xing/VBRI o por bitrate"""
+    info = {'container': 'mp3', 'duration': None, 'video': None, 'audio': 'mp3'}
+    pos = 0
+    if mm[:3] == b'ID3':
+        size = 0
+        for byte in mm[6:10]:
+            size = (size << 7) | (byte & 0x7F)
+        pos = 10 + size + (10 if mm[5] & 0x10 else 0)
+    
+    # Buscar la primera trama válida de capa III
+    limit = min(len(mm) - 4, pos + 65536)
+    while pos < limit:
+        if mm[pos] == 0xFF and (mm[pos + 1] & 0xE0) == 0xE0:
+            version = (mm[pos + 1] >> 3) & 3
+            layer = (mm[pos + 1] >> 1) & 3
+            bitrate_index = mm[pos + 2] >> 4
+            rate_index = (mm[pos + 2] >> 2) & 3
+            if version != 1 and layer == 1 and 0 < bitrate_index < 15 and rate_index < 3:
+                break
+        pos += 1
+    else:
+        return info
+    
+    mpeg1 = version == 3
+    sample_rate = _MP3_SAMPLE_RATES[rate_index] >> (0 if mpeg1 else 1 if version == 2 else 2)
+    bitrate = _MP3_BITRATES[1 if mpeg1 else 2][bitrate_index] * 1000
+    samples_per_frame = 1152 if mpeg1 else 576
+    mono = (mm[pos + 3] >> 6) == 3
+    
+    # Cabecera Xing/Info tras la información lateral
+    xing = pos + 4 + ((17 if mono else 32) if mpeg1 else (9 if mono else 17))
+    if mm[xing:xing + 4] in (b'Xing', b'Info') and mm[xing + 7] & 1:
+        frames = struct.unpack_from('>I', mm, xing + 8)[0]
+        info['duration'] = frames * samples_per_frame / sample_rate
+        return info
+    if mm[pos + 36:pos + 40] == b'VBRI':
+        frames = struct.unpack_from('>I', mm, pos + 36 + 14)[0]
+        info['duration'] = frames * samples_per_frame / sample_rate
+        return info
+    
+    # Sin cabecera VBR: estimación por bitrate constante
+    end = len(mm) - (128 if mm[-128:-125] == b'TAG' else 0)
+    info['duration'] = (end - pos) * 8 / bitrate
+    return info
+
+
+def probe_media(path):
+    """Lee duración y códecs de las cabeceras del contenedor sin lanzar ffprobe.
+    
+    Devuelve un diccionario con 'container', 'duration' (segundos o None),
+    'video' y 'audio' (códecs o None), o None si el formato no se reconoce.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < 32:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            try:
+                if mm[4:8] == b'ftyp':
+                    return _probe_mp4(mm)
+                if mm[:4] == b'\x1a\x45\xdf\xa3':
+                    return _probe_matroska(mm)
+                if mm[:4] == b'OggS':
+                    return _probe_ogg(mm)
+                if mm[:3] == b'ID3' or (mm[0] == 0xFF and (mm[1] & 0xE0) == 0xE0):
+                    return _probe_mp3(mm)
+            except (struct.error, ValueError, IndexError):
+                # Archivo truncado o corrupto
+                return None
+    return None
+
+
+class MediaCache:
+    """Caché persistente de información de archivos, indexada por ruta, mtime y tamaño"""
+    
+    def __init__(self, cache_path=None):
+        self.cache_path = Path(cache_path or Path.home() / ".pytube_media_cache.json")
+        self.entries = {}
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.load()
+    
+    def load(self):
+        """Carga la caché desde disco"""
+        try:
+            if self.cache_path.exists():
+                with open(self.cache_path, 'r') as f:
+                    self.entries = json.load(f)
+        except Exception as e:
+            print(f"Error cargando caché de medios: {e}")
+            self.entries = {}
+    
+    def save(self):
+        """Guarda la caché en disco si ha cambiado"""
+        with self.lock:
+            if not self.dirty:
+                return
+            data = json.dumps(self.entries)
+            self.dirty = False
+        try:
+            tmp_path = self.cache_path.with_suffix('.tmp')
+            with open(tmp_path, 'w') as f:
+                f.write(data)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"Error guardando caché de medios: {e}")
+    
+    def clear(self):
+        """Vacía la caché"""
+        with self.lock:
+            self.entries = {}
+            self.dirty = True
+        self.save()
+    
+    def get(self, path, stat=None):
+        """Devuelve la información del archivo, sondeándolo solo si cambió"""
+        path = os.path.abspath(path)
+        stat = stat or os.stat(path)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry and entry.get('mtime') == stat.st_mtime_ns and entry.get('size') == stat.st_size:
+                return entry['info']
+        
+        try:
+            info = probe_media(path)
+        except OSError:
+            info = None
+        
+        with self.lock:
+            self.entries[path] = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'info': info}
+            self.dirty = True
+        return info
+    
+    def save_analysis(self, path, analysis):
+        """Guarda el análisis de audio junto a la información del archivo"""
+        path = os.path.abspath(path)
+        info = self.get(path)
+        stat = os.stat(path)
+        with self.lock:
+            self.entries[path] = {'mtime': stat.st_mtime_ns, 'size': stat.st_size,
+                                  'info': info, 'analysis': analysis}
+            self.dirty = True
+    
+    def get_analysis(self, path):
+        """Devuelve el análisis de audio guardado si el archivo no ha cambiado"""
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry and entry.get('mtime') == stat.st_mtime_ns and entry.get('size') == stat.st_size:
+                return entry.get('analysis')
+        return None
+    
+    def scan(self, folder, threads=8):
+        """Sondea los archivos multimedia de una carpeta (recursivo), más recientes primero"""
+        files = []
+        pending = [folder]
+        while pending:
+            try:
+                with os.scandir(pending.pop()) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif entry.name.lower().endswith(MEDIA_EXTENSIONS):
+                            files.append((entry.path, entry.stat()))
+            except OSError:
+                continue
+        
+        files.sort(key=lambda a: a[1].st_mtime, reverse=True)
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            infos = list(executor.map(lambda a: self.get(*a), files))
+        
+        # Olvidar archivos que ya no existen en la carpeta
+        seen = {os.path.abspath(path) for path, _ in files}
+        prefix = os.path.join(os.path.abspath(folder), '')
+        with self.lock:
+            for path in [r for r in self.entries if r.startswith(prefix) and r not in seen]:
+                del self.entries[path]
+                self.dirty = True
+        
+        self.save()
+        return [(path, info) for (path, _), info in zip(files, infos) if info]
+
+
+def find_download_file(base_path):
+    """Encuentra el archivo final de una descarga guardada sin extensión"""
+    if os.path.isfile(base_path):
+        return base_path
+    for ext in MEDIA_EXTENSIONS:
+        if os.path.isfile(base_path + ext):
+            return base_path + ext
+    return None
+
+
+# ===== ANÁLISIS DE AUDIO (FORMA DE ONDA Y SONORIDAD) =====
+ANALYSIS_SAMPLE_RATE = 48000
+SEGMENT_SAMPLES = ANALYSIS_SAMPLE_RATE // 10  # Segmentos de 100 ms
+WAVEFORM_POINTS = 200
+
+# Filtro de ponderación K de ITU-R BS.1770 a 48 kHz (shelving + paso alto RLB)
+_K_FILTERS = (
+    ((1.53512485958697, -2.69169618940638, 1.19839281085285),
+     (1.0, -1.69065929318241, 0.73248077421585)),
+    ((1.0, -2.0, 1.0),
+     (1.0, -1.99004745483398, 0.99007225036621)),
+)
+_segment_weights = None
+
+
+def _k_weighting_weights():
+    """Pesos por bin de la rfft de un segmento: |H_K(f)|^2 con el factor de Parseval"""
+    global _segment_weights
+    if _segment_weights is None:
+        z = np.exp(-1j * np.pi * np.arange(SEGMENT_SAMPLES // 2 + 1) / (SEGMENT_SAMPLES // 2))
+        response = np.ones_like(z)
+        for b, a in _K_FILTERS:
+            response *= (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+        parseval = np.full(z.shape, 2.0)
+        parseval[0] = parseval[-1] = 1.0
+        _segment_weights = np.abs(response) ** 2 * parseval / SEGMENT_SAMPLES ** 2
+    return _segment_weights
+
+
+def _read_wav_header(stream):
+    """Lee la cabecera WAV de un pipe de ffmpeg y devuelve el número de canales"""
+    if stream.read(12)[8:12] != b'WAVE':
+        raise ValueError("ffmpeg no devolvió audio WAV")
+    channels = None
+    while True:
+        header = stream.read(8)
+        if len(header) < 8:
+            raise ValueError("WAV sin datos")
+        kind, size = struct.unpack('<4sI', header)
+        if kind == b'data':
+            return channels
+        data = stream.read(size + (size & 1))
+        if kind == b'fmt ':
+            channels = struct.unpack_from('<H', data, 2)[0]
+
+
+def analyze_audio(ffmpeg, path, points=WAVEFORM_POINTS, chunk_seconds=10):
+    """Calcula la forma de onda reducida y la sonoridad integrada (LUFS) de un archivo.
+    
+    El audio se decodifica con ffmpeg a PCM de 48 kHz y se procesa por bloques
+    de segundos_bloque, así que la memoria no depende de la duración. La
+    ponderación K se aplica en frecuencia sobre segmentos de 100 ms, que luego
+    forman los bloques de 400 ms con solape del 75% de BS.1770.
+    """
+    command = [
+        ffmpeg, '-v', 'error', '-nostdin', '-i', path, '-map', '0:a:0',
+        '-af', 'aformat=channel_layouts=mono|stereo',
+        '-ar', str(ANALYSIS_SAMPLE_RATE), '-acodec', 'pcm_f32le', '-f', 'wav', '-',
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    weights = _k_weighting_weights()
+    peaks, energies = [], []
+    try:
+        channels = _read_wav_header(process.stdout)
+        segment_bytes = SEGMENT_SAMPLES * channels * 4
+        chunk_bytes = segment_bytes * 10 * chunk_seconds
+        remainder = b''
+        while True:
+            data = process.stdout.read(chunk_bytes)
+            if not data:
+                break
+            data = remainder + data
+            full_segments = len(data) // segment_bytes
+            remainder = data[full_segments * segment_bytes:]
+            if not full_segments:
+                continue
+            
+            segments = np.frombuffer(data, dtype='<f4', count=full_segments * SEGMENT_SAMPLES * channels)
+            segments = segments.reshape(full_segments, SEGMENT_SAMPLES, channels)
+            peaks.append(np.abs(segments).max(axis=(1, 2)))
+            spectrum = np.fft.rfft(segments, axis=1)
+            power = spectrum.real ** 2 + spectrum.imag ** 2
+            energies.append((power * weights[None, :, None]).sum(axis=(1, 2)))
+        
+        # Último segmento incompleto: cuenta para la forma de onda
+        if len(remainder) >= channels * 4:
+            tail = np.frombuffer(remainder, dtype='<f4', count=len(remainder) // 4)
+            peaks.append(np.array([np.abs(tail).max()]))
+    finally:
+        process.stdout.close()
+        process.wait()
+    
+    if process.returncode != 0 or not peaks:
+        raise RuntimeError(f"ffmpeg no pudo decodificar {path}")
+    
+    peaks = np.concatenate(peaks)
+    groups = np.array_split(peaks, min(points, len(peaks)))
+    waveform = [round(float(g.max()), 3) for g in groups]
+    
+    return {
+        'waveform': waveform,
+        'lufs': _integrated_loudness(np.concatenate(energies) if energies else np.zeros(0)),
+        'peak': round(float(peaks.max()), 4),
+    }
+
+
+def _integrated_loudness(energies):
+    """Sonoridad integrada BS.1770 a partir de la energía ponderada de cada segmento de 100 ms"""
+    if len(energies) < 4:
+        return None
+    blocks = np.convolve(energies, np.full(4, 0.25), mode='valid')
+    with np.errstate(divide='ignore'):
+        loudness = -0.691 + 10 * np.log10(blocks)
+    
+    blocks = blocks[loudness > -70]  # Puerta absoluta
+    if not len(blocks):
+        return None
+    threshold = -0.691 + 10 * np.log10(blocks.mean()) - 10
+    blocks = blocks[-0.691 + 10 * np.log10(blocks) > threshold]  # Puerta relativa
+    return round(float(-0.691 + 10 * np.log10(blocks.mean())), 1)
+
+
+class AudioAnalysisPP(FFmpegPostProcessor):
+    """Etapa opcional tras FFmpegExtractAudio: analiza el audio mientras sigue en caché"""
+    
+    def __init__(self, cache, downloader=None):
+        super().__init__(downloader)
+        self.cache = cache
+    
+    def run(self, info):
+        path = info.get('filepath')
+        if not path or np is None:
+            return [], info
+        if not self.available:
+            self.report_warning("ffmpeg no está disponible; se omite el análisis de audio")
+            return [], info
+        
+        self.to_screen(f'Analizando forma de onda y sonoridad de "{path}"')
+        try:
+            analysis = analyze_audio(self.executable, path)
+        except Exception as e:
+            # El análisis es opcional: no debe estropear la descarga
+            self.report_warning(f"No se pudo analizar el audio: {e}")
+            return [], info
+        
+        self.cache.save_analysis(path, analysis)
+        self.cache.save()
+        return [], info
+
+
+# ===== MÉTRICAS DE RENDIMIENTO =====
+SPARKLINE_BLOCKS = "▁▂▃▄▅▆▇█"
+
+
+class RingBuffer:
+    """Buffer circular preasignado de muestras (tiempo, valor)"""
+    
+    def __init__(self, capacity=300):
+        self.capacity = capacity
+        self.times = array('d', bytes(8 * capacity))
+        self.values = array('d', bytes(8 * capacity))
+        self.next_index = 0
+        self.count = 0
+    
+    def append(self, timestamp, value):
+        """Añade una muestra sobrescribiendo la más antigua si está lleno"""
+        self.times[self.next_index] = timestamp
+        self.values[self.next_index] = value
+        self.next_index = (self.next_index + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+    
+    def last(self):
+        """Último valor registrado (0 si está vacío)"""
+        if not self.count:
+            return 0.0
+        return self.values[self.next_index - 1]
+    
+    def samples(self, n=None):
+        """Devuelve las últimas n muestras en orden cronológico"""
+        n = self.count if n is None else min(n, self.count)
+        start = self.next_index - n
+        return [(self.times[i % self.capacity], self.values[i % self.capacity])
+                for i in range(start, self.next_index)]
+
+
+def sparkline(values, width=40):
+    """Dibuja una serie de valores como texto con bloques Unicode"""
+    values = list(values)[-width:]
+    if not values:
+        return ""
+    max_value = max(values)
+    if max_value <= 0:
+        return SPARKLINE_BLOCKS[0] * len(values)
+    levels = len(SPARKLINE_BLOCKS) - 1
+    return "".join(SPARKLINE_BLOCKS[int(v / max_value * levels)] for v in values)
+
+
+class JobStats:
+    """Contadores de un trabajo; el hook de progreso solo sobrescribe atributos"""
+    
+    __slots__ = ('title', 'completed_bytes', 'downloaded', 'previous_bytes', 'speed', 'history')
+    
+    def __init__(self, title, capacity):
+        self.title = title
+        self.completed_bytes = 0  # Bytes de archivos ya terminados (video y audio por separado)
+        self.downloaded = 0  # Bytes del archivo en curso
+        self.previous_bytes = 0
+        self.speed = None  # Velocidad reportada por un worker remoto
+        self.history = RingBuffer(capacity)
+
+
+class ThroughputMonitor:
+    """Historial de velocidad por trabajo y total, muestreado a intervalos fijos"""
+    
+    def __init__(self, capacity=300, max_finished=20):
+        self.capacity = capacity
+        self.max_finished = max_finished
+        self.active = {}
+        self.finished = {}
+        self.total = RingBuffer(capacity)
+        self.completions = deque(maxlen=1000)
+        self.last_sample_time = None
+        self.lock = threading.Lock()
+    
+    def start(self, key, title):
+        """Registra un trabajo activo"""
+        with self.lock:
+            self.active[key] = JobStats(title, self.capacity)
+    
+    def finish(self, key, completed=True):
+        """Saca un trabajo de los activos y conserva su historial"""
+        with self.lock:
+            job = self.active.pop(key, None)
+            if job is None:
+                return
+            self.finished[key] = job
+            while len(self.finished) > self.max_finished:
+                del self.finished[next(iter(self.finished))]
+        if completed:
+            self.completions.append(time.time())
+    
+    def record_progress(self, key, d):
+        """Se llama desde el hook de progreso; solo actualiza contadores existentes"""
+        job = self.active.get(key)
+        if job is None:
+            return
+        if d['status'] == 'downloading':
+            job.downloaded = d.get('downloaded_bytes') or 0
+        elif d['status'] == 'finished':
+            job.completed_bytes += d.get('total_bytes') or d.get('downloaded_bytes') or 0
+            job.downloaded = 0
+    
+    def sync_remote(self, jobs):
+        """Actualiza los trabajos de otros nodos a partir de la cola compartida"""
+        now = time.time()
+        # Solo cuentan los trabajos con lease vigente (igual que active_workers)
+        running = {f"queue:{t['id']}": t for t in jobs
+                   if t['status'] == 'running' and (t['lease_until'] or 0) >= now}
+        with self.lock:
+            for key in [c for c in self.active if c.startswith("queue:") and c not in running]:
+                self.finished[key] = self.active.pop(key)
+            while len(self.finished) > self.max_finished:
+                del self.finished[next(iter(self.finished))]
+            for key, t in running.items():
+                job = self.active.get(key)
+                if job is None:
+                    job = self.active[key] = JobStats(
+                        f"{t['title']} ({t['worker']})", self.capacity
+                    )
+                job.speed = t['speed'] or 0.0
+    
+    def sample(self, now=None):
+        """Toma una muestra de velocidad de cada trabajo activo y del total"""
+        now = now or time.time()
+        interval = now - self.last_sample_time if self.last_sample_time else None
+        self.last_sample_time = now
+        
+        total = 0.0
+        with self.lock:
+            for job in self.active.values():
+                if job.speed is not None:
+                    speed = job.speed
+                else:
+                    current_bytes = job.completed_bytes + job.downloaded
+                    delta = current_bytes - job.previous_bytes
+                    job.previous_bytes = current_bytes
+                    speed = delta / interval if interval and delta > 0 else 0.0
+                job.history.append(now, speed)
+                total += speed
+        self.total.append(now, total)
+    
+    def jobs_per_hour(self):
+        """Trabajos locales completados en la última hora"""
+        limit = time.time() - 3600
+        return sum(1 for t in self.completions if t >= limit)
+    
+    def export_csv(self, path):
+        """Exporta las series temporales (total y por trabajo) a CSV"""
+        with self.lock:
+            series = [("total", "Total", self.total)]
+            for key, job in list(self.finished.items()) + list(self.active.items()):
+                series.append((key, job.title, job.history))
+            rows = [(key, title, timestamp, value)
+                    for key, title, buffer in series
+                    for timestamp, value in buffer.samples()]
+        
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(["series", "title", "timestamp", "bytes_per_second"])
+            for key, title, timestamp, value in rows:
+                writer.writerow([key, title, datetime.fromtimestamp(timestamp).isoformat(timespec='seconds'),
+                                 f"{value:.0f}"])
+        return len(rows)
+
 
 # ===== CLASE PRINCIPAL DE LA APLICACIÓN =====
 class YouTubeDownloaderApp:
@@ -19,16 +1253,28 @@ class YouTubeDownloaderApp:
         self.downloads_history = []
         self.current_video_info = None
         self.is_downloading = False
+        self.job_queue = None
+        self.media_cache = MediaCache()
+        self.playlist = []
+        self.current_track_path = None
+        self.monitor = ThroughputMonitor()
+        self.active_job_key = None
+        self.local_jobs = 0
+        self.queue_snapshot = None
         
         # Configuraciones por defecto
         self.settings = {
             "theme": "dark",
-            "download_path": str(Path.home() / "Downloads" / "PyTube"),
+            "download_path": DEFAULT_DOWNLOAD_PATH,
             "default_quality": "best",
             "default_format": "video",
             "auto_play": False,
             "notifications": True,
-            "theme_color": "blue"
+            "theme_color": "blue",
+            "shared_queue": "",
+            "avoid_conversion": True,
+            "throughput_bps": None,
+            "analyze_audio": False
         }
         
         # Crear directorio de descargas si no existe
@@ -39,6 +1285,10 @@ class YouTubeDownloaderApp:
         
         # Construir la interfaz
         self.build_ui()
+        
+        # Vigilar la cola compartida y muestrear el rendimiento en segundo plano
+        threading.Thread(target=self.poll_queue, daemon=True).start()
+        threading.Thread(target=self.sample_throughput, daemon=True).start()
     
     # ===== CARGA Y GUARDADO DE CONFIGURACIONES =====
     def load_settings(self):
@@ -84,6 +1334,7 @@ class YouTubeDownloaderApp:
         self.build_downloads_tab()
         self.build_player_tab()
         self.build_settings_tab()
+        self.build_dashboard_tab()
         
         # Barra de navegación inferior CORREGIDA
         self.nav_bar = ft.NavigationBar(
@@ -94,6 +1345,7 @@ class YouTubeDownloaderApp:
                 ft.NavigationDestination(icon="download", label="Descargas"),
                 ft.NavigationDestination(icon="play_circle", label="Reproductor"),
                 ft.NavigationDestination(icon="settings", label="Ajustes"),
+                ft.NavigationDestination(icon="insights", label="Panel"),
             ]
         )
         
@@ -177,7 +1429,8 @@ class YouTubeDownloaderApp:
                 ft.dropdown.Option("360p", "360p"),
             ],
             value="best",
-            width=200
+            width=200,
+            on_change=lambda _: self.update_format_estimate()
         )
         
         self.audio_format_dropdown = ft.Dropdown(
@@ -189,14 +1442,25 @@ class YouTubeDownloaderApp:
             ],
             value="mp3",
             width=200,
-            visible=False
+            visible=False,
+            on_change=lambda _: self.update_format_estimate()
         )
         
+        # Preferir códecs que no requieren conversión tras descargar
+        self.avoid_conversion_checkbox = ft.Checkbox(
+            label="Preferir formatos que no requieren conversión",
+            value=self.settings.get("avoid_conversion", True),
+            on_change=self.toggle_avoid_conversion
+        )
+        
+        # Formatos elegidos, tamaño y tiempo estimados
+        self.format_estimate = ft.Text("", size=12, color="grey", visible=False)
+        
         # Actualizar visibilidad del formato de audio según selección
         def format_changed(e):
             is_audio = self.format_radio.value == "audio"
             self.audio_format_dropdown.visible = is_audio
-            self.page.update()
+            self.update_format_estimate()
         
         self.format_radio.on_change = format_changed
         
@@ -217,6 +1481,15 @@ class YouTubeDownloaderApp:
             on_click=lambda _: self.start_download(),
         )
         
+        # Botón para enviar a la cola compartida (modo multi-nodo)
+        self.enqueue_btn = ft.OutlinedButton(
+            "Enviar a la cola",
+            icon="playlist_add",
+            disabled=True,
+            visible=bool(self.settings.get("shared_queue")),
+            on_click=lambda _: self.enqueue_download(),
+        )
+        
         # Contenido de la pestaña de inicio
         self.home_content = ft.ListView(
             spacing=15,
@@ -235,9 +1508,11 @@ class YouTubeDownloaderApp:
                     self.quality_dropdown,
                     self.audio_format_dropdown
                 ], spacing=10),
+                self.avoid_conversion_checkbox,
+                self.format_estimate,
                 self.progress_bar,
                 self.progress_text,
-                self.download_btn,
+                ft.Row([self.download_btn, self.enqueue_btn], spacing=10),
             ]
         )
     
@@ -250,6 +1525,19 @@ class YouTubeDownloaderApp:
             padding=20,
         )
         
+        # Trabajos de la cola compartida (todos los nodos)
+        self.queue_summary = ft.Text("", size=12, color="grey")
+        self.queue_list = ft.ListView(
+            spacing=5,
+            height=220,
+        )
+        self.queue_section = ft.Column([
+            ft.Text("Cola compartida", size=18, weight=ft.FontWeight.BOLD),
+            self.queue_summary,
+            self.queue_list,
+            ft.Divider(),
+        ], visible=bool(self.settings.get("shared_queue")))
+        
         self.downloads_content = ft.Column([
             ft.Row([
                 ft.Text("Mis Descargas", size=24, weight=ft.FontWeight.BOLD, expand=True),
@@ -260,6 +1548,7 @@ class YouTubeDownloaderApp:
                 )
             ]),
             ft.Divider(),
+            self.queue_section,
             self.downloads_list
         ], expand=True)
         
@@ -291,6 +1580,14 @@ class YouTubeDownloaderApp:
         self.current_time = ft.Text("0:00")
         self.total_time = ft.Text("0:00")
         
+        # Forma de onda precalculada, dibujada detrás del slider de posición
+        self.waveform = ft.Row(
+            spacing=1,
+            visible=False,
+            vertical_alignment=ft.CrossAxisAlignment.CENTER
+        )
+        self.player_loudness = ft.Text("", size=12, color="grey", visible=False)
+        
         self.volume_slider = ft.Slider(
             min=0,
             max=100,
@@ -318,6 +1615,7 @@ class YouTubeDownloaderApp:
                         ft.Icon("music_note", size=80, color=self.get_theme_color()),
                         self.player_title,
                         self.player_subtitle,
+                        self.player_loudness,
                     ], horizontal_alignment=ft.CrossAxisAlignment.CENTER, spacing=10)
                 ),
                 ft.Container(height=20),
@@ -328,7 +1626,10 @@ class YouTubeDownloaderApp:
                 ], alignment=ft.MainAxisAlignment.CENTER),
                 ft.Row([
                     self.current_time,
-                    self.position_slider,
+                    ft.Stack([
+                        ft.Container(content=self.waveform, left=24, right=24, top=0, bottom=0),
+                        ft.Container(content=self.position_slider, left=0, right=0, top=0, bottom=0),
+                    ], height=48, expand=True),
                     self.total_time,
                 ], spacing=10),
                 ft.Row([
@@ -373,6 +1674,14 @@ class YouTubeDownloaderApp:
             on_change=self.toggle_notifications
         )
         
+        self.analyze_audio_switch = ft.Switch(
+            label="Analizar forma de onda y sonoridad del audio (solo descargas locales)"
+                  + ("" if np is not None else " (requiere NumPy)"),
+            value=self.settings.get("analyze_audio", False) and np is not None,
+            disabled=np is None,
+            on_change=self.toggle_analyze_audio
+        )
+        
         # Campo de ruta de descargas
         self.download_path_field = ft.TextField(
             label="Carpeta de descargas",
@@ -381,6 +1690,16 @@ class YouTubeDownloaderApp:
             prefix_icon="folder"
         )
         
+        # Ruta de la cola compartida para el modo multi-nodo
+        self.queue_path_field = ft.TextField(
+            label="Cola compartida (archivo SQLite)",
+            hint_text="/mnt/compartido/pytube_cola.db",
+            value=self.settings.get("shared_queue", ""),
+            prefix_icon="lan",
+            on_submit=self.change_queue_path,
+            on_blur=self.change_queue_path
+        )
+        
         self.settings_content = ft.ListView(
             padding=20,
             spacing=15,
@@ -393,6 +1712,7 @@ class YouTubeDownloaderApp:
                 ft.Text("Comportamiento", size=18, weight=ft.FontWeight.BOLD),
                 self.auto_play_switch,
                 self.notifications_switch,
+                self.analyze_audio_switch,
                 ft.Divider(),
                 ft.Text("Almacenamiento", size=18, weight=ft.FontWeight.BOLD),
                 self.download_path_field,
@@ -401,6 +1721,9 @@ class YouTubeDownloaderApp:
                     icon="folder_open",
                     on_click=self.change_download_folder
                 ),
+                self.queue_path_field,
+                ft.Text("Los workers se inician con: python BlackTube.py --worker --queue <ruta>",
+                     size=12, color="grey"),
                 ft.Container(height=20),
                 ft.ElevatedButton(
                     "Limpiar caché",
@@ -415,6 +1738,55 @@ class YouTubeDownloaderApp:
             ]
         )
     
+    # ===== TAB 5: PANEL DE RENDIMIENTO =====
+    def build_dashboard_tab(self):
+        """Construye la pestaña con el historial de velocidad de las descargas"""
+        
+        def stat_card(icon, label):
+            value = ft.Text("--", size=20, weight=ft.FontWeight.BOLD)
+            card = ft.Card(
+                content=ft.Container(
+                    padding=15,
+                    width=160,
+                    content=ft.Column([
+                        ft.Icon(icon, color=self.get_theme_color()),
+                        value,
+                        ft.Text(label, size=12, color="grey"),
+                    ], spacing=4)
+                )
+            )
+            return value, card
+        
+        self.stat_queue, queue_card = stat_card("pending_actions", "Trabajos en cola")
+        self.stat_workers, workers_card = stat_card("dns", "Workers activos")
+        self.stat_speed, speed_card = stat_card("speed", "Velocidad total")
+        self.stat_rate, rate_card = stat_card("task_alt", "Trabajos por hora")
+        
+        self.total_sparkline = ft.Text("", font_family="monospace", size=16)
+        self.jobs_dashboard = ft.Column(spacing=8)
+        
+        self.dashboard_content = ft.ListView(
+            padding=20,
+            spacing=15,
+            controls=[
+                ft.Row([
+                    ft.Text("Panel de rendimiento", size=24, weight=ft.FontWeight.BOLD, expand=True),
+                    ft.IconButton(
+                        icon="file_download",
+                        on_click=self.export_metrics,
+                        tooltip="Exportar series (CSV)"
+                    )
+                ]),
+                ft.Divider(),
+                ft.Row([queue_card, workers_card, speed_card, rate_card], wrap=True),
+                ft.Text("Velocidad total (últimos 5 min)", size=16, weight=ft.FontWeight.BOLD),
+                self.total_sparkline,
+                ft.Divider(),
+                ft.Text("Trabajos activos", size=16, weight=ft.FontWeight.BOLD),
+                self.jobs_dashboard,
+            ]
+        )
+    
     # ===== FUNCIONES DE NAVEGACIÓN =====
     def nav_changed(self, e):
         """Cambia entre las diferentes pestañas"""
@@ -427,8 +1799,12 @@ class YouTubeDownloaderApp:
             self.refresh_downloads()
         elif self.current_tab == 2:
             self.main_container.content = self.player_content
+            self.refresh_playlist()
         elif self.current_tab == 3:
             self.main_container.content = self.settings_content
+        elif self.current_tab == 4:
+            self.main_container.content = self.dashboard_content
+            self.refresh_dashboard(update=False)
         
         self.page.update()
     
@@ -513,6 +1889,9 @@ class YouTubeDownloaderApp:
                         
                         self.video_info_card.visible = True
                         self.download_btn.disabled = False
+                        self.enqueue_btn.disabled = False
+                        self.update_quality_sizes()
+                        self.update_format_estimate(update=False)
                         self.fetch_btn.disabled = False
                         self.fetch_btn.text = "Buscar"
                         
@@ -552,6 +1931,9 @@ class YouTubeDownloaderApp:
             return
         
         self.is_downloading = True
+        self.local_jobs += 1
+        self.active_job_key = f"local:{self.local_jobs}"
+        self.monitor.start(self.active_job_key, self.current_video_info['title'])
         self.download_btn.disabled = True
         self.progress_bar.visible = True
         self.progress_text.visible = True
@@ -566,32 +1948,22 @@ class YouTubeDownloaderApp:
                 quality = self.quality_dropdown.value
                 
                 # Crear nombre de archivo
-                safe_title = "".join(c for c in self.current_video_info['title'] 
-                                   if c.isalnum() or c in (' ', '-', '_')).strip()
+                safe_title = safe_filename(self.current_video_info['title'])
                 
-                ydl_opts = {
-                    'outtmpl': os.path.join(self.settings["download_path"], f'{safe_title}.%(ext)s'),
-                    'progress_hooks': [self.download_progress_hook],
-                }
+                selection = self.get_format_selection()
+                postprocessors = []
+                if format_type == "audio" and self.settings.get("analyze_audio") and np is not None:
+                    postprocessors.append(AudioAnalysisPP(self.media_cache))
                 
-                # Configurar según tipo de descarga
-                if format_type == "audio":
-                    audio_format = self.audio_format_dropdown.value
-                    ydl_opts['format'] = 'bestaudio/best'
-                    ydl_opts['postprocessors'] = [{
-                        'key': 'FFmpegExtractAudio',
-                        'preferredcodec': audio_format,
-                        'preferredquality': '192',
-                    }]
-                else:
-                    if quality == "best":
-                        ydl_opts['format'] = 'bestvideo+bestaudio/best'
-                    else:
-                        ydl_opts['format'] = f'bestvideo[height<={quality[:-1]}]+bestaudio/best[height<={quality[:-1]}]'
+                ydl_opts = build_download_options(
+                    self.settings["download_path"], safe_title, format_type, quality,
+                    self.audio_format_dropdown.value,
+                    progress_hooks=[self.download_progress_hook],
+                    format_id=selection['format_id'] if selection else None,
+                )
                 
                 # Descargar
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    ydl.download([self.current_video_info['webpage_url']])
+                run_download(self.current_video_info['webpage_url'], ydl_opts, postprocessors)
                 
                 # Guardar en historial
                 download_entry = {
@@ -602,8 +1974,11 @@ class YouTubeDownloaderApp:
                     'path': os.path.join(self.settings["download_path"], safe_title)
                 }
                 self.downloads_history.append(download_entry)
+                self.monitor.finish(self.active_job_key)
                 
                 def finish_download():
+                    self.save_settings()
+                    self.update_format_estimate(update=False)
                     self.is_downloading = False
                     self.download_btn.disabled = False
                     self.progress_bar.visible = False
@@ -621,6 +1996,8 @@ class YouTubeDownloaderApp:
                 self.page.run_task(finish_download)
                 
             except Exception as e:
+                self.monitor.finish(self.active_job_key, completed=False)
+                
                 def show_error():
                     self.is_downloading = False
                     self.download_btn.disabled = False
@@ -635,6 +2012,7 @@ class YouTubeDownloaderApp:
     
     def download_progress_hook(self, d):
         """Hook para actualizar el progreso de descarga"""
+        self.monitor.record_progress(self.active_job_key, d)
         if d['status'] == 'downloading':
             try:
                 percent = d.get('_percent_str', '0%').strip('%')
@@ -649,6 +2027,220 @@ class YouTubeDownloaderApp:
                 self.page.run_task(update_progress)
             except:
                 pass
+        elif d['status'] == 'finished':
+            self.record_throughput(d)
+    
+    # ===== FUNCIONES DE FORMATOS =====
+    def get_format_selection(self):
+        """Elige los formatos para las opciones actuales a partir del info dict"""
+        if not self.current_video_info:
+            return None
+        return select_formats(
+            self.current_video_info,
+            self.format_radio.value,
+            self.quality_dropdown.value,
+            self.audio_format_dropdown.value,
+            self.settings.get("avoid_conversion", True),
+        )
+    
+    def update_format_estimate(self, update=True):
+        """Muestra los formatos elegidos con su tamaño y tiempo estimados"""
+        selection = self.get_format_selection()
+        if selection is None:
+            self.format_estimate.visible = False
+        else:
+            throughput = self.settings.get("throughput_bps")
+            eta = None
+            if selection['size'] and throughput:
+                eta = selection['size'] / throughput
+            self.format_estimate.value = (
+                f"Formatos: {selection['description']}\n"
+                f"Tamaño estimado: {format_bytes(selection['size'])} - "
+                f"Tiempo estimado: {format_time(eta)}"
+            )
+            self.format_estimate.visible = True
+        
+        if update:
+            self.page.update()
+    
+    def update_quality_sizes(self):
+        """Añade el tamaño estimado a cada opción de calidad"""
+        for option in self.quality_dropdown.options:
+            label = "Mejor calidad" if option.key == "best" else option.key
+            selection = select_formats(
+                self.current_video_info, "video", option.key,
+                avoid_conversion=self.settings.get("avoid_conversion", True)
+            )
+            if selection and selection['size']:
+                label += f" (~{format_bytes(selection['size'])})"
+            option.text = label
+    
+    def record_throughput(self, d):
+        """Actualiza el rendimiento medido (media móvil) con una descarga terminada"""
+        total = d.get('total_bytes') or d.get('downloaded_bytes')
+        elapsed = d.get('elapsed')
+        if not total or not elapsed or elapsed < 1:
+            return
+        
+        measured = total / elapsed
+        previous = self.settings.get("throughput_bps")
+        self.settings["throughput_bps"] = measured if not previous else 0.7 * previous + 0.3 * measured
+    
+    # ===== FUNCIONES DE COLA COMPARTIDA =====
+    def get_queue(self):
+        """Obtiene la cola compartida configurada (o None)"""
+        path = self.settings.get("shared_queue", "")
+        if not path:
+            return None
+        if self.job_queue is None or self.job_queue.path != path:
+            self.job_queue = JobQueue(path)
+        return self.job_queue
+    
+    def enqueue_download(self):
+        """Envía la descarga actual a la cola compartida"""
+        if not self.current_video_info:
+            self.show_snackbar("Primero busca un video", error=True)
+            return
+        
+        try:
+            job_queue = self.get_queue()
+            if job_queue is None:
+                self.show_snackbar("Configura la cola compartida en Ajustes", error=True)
+                return
+            
+            selection = self.get_format_selection()
+            options = {
+                'format_type': self.format_radio.value,
+                'quality': self.quality_dropdown.value,
+                'audio_format': self.audio_format_dropdown.value,
+                'format_id': selection['format_id'] if selection else None,
+            }
+            job_id = job_queue.enqueue(self.current_video_info['webpage_url'],
+                                       self.current_video_info['title'], options)
+            self.show_snackbar(f"Trabajo #{job_id} enviado a la cola")
+        except Exception as e:
+            self.show_snackbar(f"Error en la cola: {str(e)}", error=True)
+        
+        self.page.update()
+    
+    def poll_queue(self):
+        """Lee periódicamente la cola compartida y refresca la lista si está visible"""
+        while True:
+            time.sleep(3)
+            try:
+                job_queue = self.get_queue()
+                if job_queue is None:
+                    self.queue_snapshot = None
+                    self.monitor.sync_remote([])
+                    continue
+                jobs = job_queue.list_jobs(limit=50)
+                active = job_queue.running()
+                summary = job_queue.summary()
+            except Exception as e:
+                print(f"Error leyendo la cola: {e}")
+                self.queue_snapshot = None
+                self.monitor.sync_remote([])
+                continue
+            
+            self.queue_snapshot = summary
+            self.monitor.sync_remote(active)
+            if self.current_tab == 1:
+                self.page.run_task(lambda: self.refresh_queue(jobs, summary))
+    
+    def refresh_queue(self, jobs, summary):
+        """Actualiza la lista de trabajos de la cola compartida"""
+        statuses = summary['statuses']
+        self.queue_summary.value = (
+            f"Pendientes: {statuses.get('pending', 0)} - "
+            f"En curso: {statuses.get('running', 0)} - "
+            f"Completados: {statuses.get('completed', 0)} - "
+            f"Errores: {statuses.get('error', 0)} - "
+            f"Workers activos: {summary['active_workers']}"
+        )
+        
+        self.queue_list.controls.clear()
+        for job in jobs:
+            detail = STATUS_LABELS.get(job['status'], job['status'])
+            if job['worker']:
+                detail += f" en {job['worker']}"
+            if job['status'] == 'running' and job['speed']:
+                detail += f" - {job['speed'] / 1024 / 1024:.1f} MiB/s"
+            if job['status'] == 'error' and job['error']:
+                detail += f" - {job['error']}"
+            
+            self.queue_list.controls.append(
+                ft.Column([
+                    ft.Text(f"#{job['id']} {job['title']}", size=13,
+                         weight=ft.FontWeight.BOLD),
+                    ft.Text(detail, size=11, color="red" if job['status'] == 'error' else "grey"),
+                    ft.ProgressBar(value=job['progress'], color=self.get_theme_color()),
+                ], spacing=2)
+            )
+        
+        self.page.update()
+    
+    # ===== FUNCIONES DEL PANEL DE RENDIMIENTO =====
+    def sample_throughput(self):
+        """Muestrea la velocidad cada segundo y refresca el panel si está visible"""
+        while True:
+            time.sleep(1)
+            self.monitor.sample()
+            if self.current_tab == 4:
+                self.page.run_task(self.refresh_dashboard)
+    
+    def refresh_dashboard(self, update=True):
+        """Actualiza las cifras y sparklines del panel"""
+        summary = self.queue_snapshot
+        pending = 0
+        workers = 1 if self.is_downloading else 0
+        per_hour = self.monitor.jobs_per_hour()
+        if summary:
+            pending = summary['statuses'].get('pending', 0)
+            workers += summary['active_workers']
+            per_hour += summary['completed_last_hour']
+        
+        self.stat_queue.value = str(pending)
+        self.stat_workers.value = str(workers)
+        self.stat_speed.value = f"{format_bytes(self.monitor.total.last())}/s"
+        self.stat_rate.value = str(per_hour)
+        self.total_sparkline.value = sparkline(v for _, v in self.monitor.total.samples(60)) or "--"
+        
+        with self.monitor.lock:
+            jobs = list(self.monitor.active.values())
+        
+        self.jobs_dashboard.controls.clear()
+        for job in jobs:
+            self.jobs_dashboard.controls.append(
+                ft.Column([
+                    ft.Text(job.title, size=13, weight=ft.FontWeight.BOLD),
+                    ft.Row([
+                        ft.Text(sparkline(v for _, v in job.history.samples(40)),
+                             font_family="monospace", size=14),
+                        ft.Text(f"{format_bytes(job.history.last())}/s",
+                             size=12, color="grey"),
+                    ], spacing=10),
+                ], spacing=2)
+            )
+        if not self.jobs_dashboard.controls:
+            self.jobs_dashboard.controls.append(
+                ft.Text("No hay descargas en curso", size=12, color="grey")
+            )
+        
+        if update:
+            self.page.update()
+    
+    def export_metrics(self, e):
+        """Exporta el historial de velocidad a un CSV en la carpeta de descargas"""
+        path = os.path.join(
+            self.settings["download_path"],
+            f"pytube_rendimiento_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        )
+        try:
+            rows = self.monitor.export_csv(path)
+            self.show_snackbar(f"{rows} muestras exportadas a {path}")
+        except Exception as e:
+            self.show_snackbar(f"Error exportando: {str(e)}", error=True)
+        self.page.update()
     
     # ===== FUNCIONES DE HISTORIAL =====
     def refresh_downloads(self):
@@ -699,6 +2291,12 @@ class YouTubeDownloaderApp:
         """Reproduce un archivo descargado"""
         self.nav_bar.selected_index = 2
         self.nav_changed(type('obj', (object,), {'control': self.nav_bar})())
+        
+        path = find_download_file(download['path'])
+        if path:
+            self.load_track(path, self.media_cache.get(path))
+            self.media_cache.save()
+        
         self.player_title.value = download['title']
         self.player_subtitle.value = f"{download['type'].upper()} - {download['quality']}"
         self.play_pause_btn.disabled = False
@@ -706,6 +2304,94 @@ class YouTubeDownloaderApp:
         self.page.update()
     
     # ===== FUNCIONES DEL REPRODUCTOR =====
+    def refresh_playlist(self):
+        """Escanea la carpeta de descargas y rellena la lista de reproducción"""
+        def scan_thread():
+            try:
+                tracks = self.media_cache.scan(self.settings["download_path"])
+            except Exception as e:
+                print(f"Error escaneando la biblioteca: {e}")
+                return
+            self.page.run_task(lambda: self.show_playlist(tracks))
+        
+        threading.Thread(target=scan_thread, daemon=True).start()
+    
+    def show_playlist(self, tracks):
+        """Muestra las pistas escaneadas en la lista de reproducción"""
+        self.playlist = tracks
+        self.playlist_list.controls.clear()
+        
+        if not tracks:
+            self.playlist_list.controls.append(
+                ft.Text("No hay archivos en la carpeta de descargas", size=12, color="grey")
+            )
+        
+        for i, (path, info) in enumerate(tracks):
+            self.playlist_list.controls.append(
+                ft.ListTile(
+                    leading=ft.Icon("movie" if info['video'] else "music_note"),
+                    title=ft.Text(Path(path).stem, size=13),
+                    subtitle=ft.Text(self.describe_media(info), size=11, color="grey"),
+                    dense=True,
+                    on_click=lambda e, i=i: self.select_track(i),
+                )
+            )
+        
+        self.page.update()
+    
+    def describe_media(self, info):
+        """Texto corto con la duración y los códecs de un archivo"""
+        codecs = " + ".join(c for c in (info['video'], info['audio']) if c)
+        return f"{format_time(info['duration'])} - {info['container'].upper()} {codecs}"
+    
+    def select_track(self, index):
+        """Selecciona una pista de la lista de reproducción"""
+        path, info = self.playlist[index]
+        self.load_track(path, info)
+        self.player_title.value = Path(path).stem
+        self.player_subtitle.value = self.describe_media(info)
+        self.play_pause_btn.disabled = False
+        self.position_slider.disabled = False
+        self.page.update()
+    
+    def load_track(self, path, info):
+        """Prepara los controles de posición con la duración del archivo"""
+        # Se guarda la ruta: la lista se reescanea en segundo plano y cambia de orden
+        self.current_track_path = os.path.abspath(path)
+        duration = (info or {}).get('duration') or 0
+        self.position_slider.max = max(duration, 1)
+        self.position_slider.value = 0
+        self.current_time.value = "0:00"
+        self.total_time.value = format_time(duration)
+        self.show_waveform(self.media_cache.get_analysis(path))
+    
+    def show_waveform(self, analysis):
+        """Dibuja la forma de onda y la sonoridad guardadas (sin decodificar el archivo)"""
+        self.waveform.controls.clear()
+        if not analysis:
+            self.waveform.visible = False
+            self.player_loudness.visible = False
+            return
+        
+        max_value = max(analysis['waveform']) or 1
+        for value in analysis['waveform']:
+            self.waveform.controls.append(
+                ft.Container(
+                    expand=1,
+                    height=max(2, 40 * value / max_value),
+                    bgcolor=self.get_theme_color(),
+                    opacity=0.35,
+                    border_radius=1,
+                )
+            )
+        self.waveform.visible = True
+        
+        if analysis.get('lufs') is not None:
+            self.player_loudness.value = f"Sonoridad: {analysis['lufs']} LUFS - Pico: {analysis['peak']:.2f}"
+            self.player_loudness.visible = True
+        else:
+            self.player_loudness.visible = False
+    
     def toggle_play_pause(self, e):
         """Alterna entre reproducir y pausar"""
         if self.play_pause_btn.icon == "play_arrow":
@@ -719,21 +2405,52 @@ class YouTubeDownloaderApp:
     
     def seek_position(self, e):
         """Cambia la posición de reproducción"""
-        pass  # Implementación simplificada
+        self.current_time.value = format_time(e.control.value)
+        self.page.update()
     
     def change_volume(self, e):
         """Cambia el volumen"""
         pass  # Implementación simplificada
     
+    def current_track_index(self):
+        """Posición de la pista actual en la lista de reproducción (o None)"""
+        return next(
+            (i for i, (path, _) in enumerate(self.playlist)
+             if os.path.abspath(path) == self.current_track_path), None
+        )
+    
     def previous_track(self, e):
         """Reproduce el track anterior"""
-        self.show_snackbar("Track anterior")
+        if not self.playlist:
+            self.show_snackbar("La lista de reproducción está vacía", error=True)
+            return
+        current = self.current_track_index()
+        index = 0 if current is None else (current - 1) % len(self.playlist)
+        self.select_track(index)
     
     def next_track(self, e):
         """Reproduce el siguiente track"""
-        self.show_snackbar("Siguiente track")
+        if not self.playlist:
+            self.show_snackbar("La lista de reproducción está vacía", error=True)
+            return
+        current = self.current_track_index()
+        index = 0 if current is None else (current + 1) % len(self.playlist)
+        self.select_track(index)
     
     # ===== FUNCIONES DE CONFIGURACIÓN =====
+    def toggle_avoid_conversion(self, e):
+        """Activa/desactiva la preferencia por formatos sin conversión"""
+        self.settings["avoid_conversion"] = e.control.value
+        self.save_settings()
+        if self.current_video_info:
+            self.update_quality_sizes()
+        self.update_format_estimate()
+    
+    def toggle_analyze_audio(self, e):
+        """Activa/desactiva el análisis de audio tras descargar"""
+        self.settings["analyze_audio"] = e.control.value
+        self.save_settings()
+    
     def toggle_auto_play(self, e):
         """Activa/desactiva reproducción automática"""
         self.settings["auto_play"] = e.control.value
@@ -748,8 +2465,22 @@ class YouTubeDownloaderApp:
         """Cambia la carpeta de descargas"""
         self.show_snackbar("Función disponible próximamente")
     
+    def change_queue_path(self, e):
+        """Cambia la ruta de la cola compartida"""
+        path = (self.queue_path_field.value or "").strip()
+        if path == self.settings.get("shared_queue", ""):
+            return
+        
+        self.settings["shared_queue"] = path
+        self.save_settings()
+        self.enqueue_btn.visible = bool(path)
+        self.queue_section.visible = bool(path)
+        self.show_snackbar("Cola compartida actualizada" if path else "Cola compartida desactivada")
+        self.page.update()
+    
     def clear_cache(self, e):
         """Limpia la caché de la aplicación"""
+        self.media_cache.clear()
         self.show_snackbar("Caché limpiada correctamente")
     
     # ===== UTILIDADES =====
@@ -768,6 +2499,53 @@ def main(page: ft.Page):
     """Función principal que inicia la aplicación"""
     app = YouTubeDownloaderApp(page)
 
+
+def main_worker(args):
+    """Inicia uno o varios workers sin interfaz"""
+    if args.processes <= 1:
+        run_worker(args.queue, args.folder, args.id, args.exit_when_empty)
+        return
+    
+    processes = []
+    for i in range(args.processes):
+        worker_id = f"{args.id}-{i + 1}" if args.id else None
+        process = multiprocessing.Process(
+            target=run_worker,
+            args=(args.queue, args.folder, worker_id, args.exit_when_empty)
+        )
+        process.start()
+        processes.append(process)
+    
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+
+
+def parse_args(argv=None):
+    """Analiza los argumentos de línea de comandos"""
+    parser = argparse.ArgumentParser(description="PyTube - descargador de YouTube")
+    parser.add_argument("--worker", action="store_true",
+                        help="Ejecutar como worker sin interfaz de la cola compartida")
+    parser.add_argument("--queue", help="Ruta del archivo SQLite de la cola compartida")
+    parser.add_argument("--folder", default=DEFAULT_DOWNLOAD_PATH,
+                        help="Carpeta donde el worker guarda las descargas")
+    parser.add_argument("--id", help="Identificador del worker (por defecto host-pid)")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Número de procesos worker locales")
+    parser.add_argument("--exit-when-empty", action="store_true",
+                        help="Terminar cuando no queden trabajos pendientes")
+    args = parser.parse_args(argv)
+    if args.worker and not args.queue:
+        parser.error("--worker requiere --queue")
+    return args
+
 # Iniciar la aplicación
 if __name__ == "__main__":
-    ft.app(target=main)
\ No newline at end of file
+    args = parse_args()
+    if args.worker:
+        main_worker(args)
+    else:
+        ft.app(target=main)
\ No newline at end of file